@@ -5,6 +5,8 @@ from execution import spotify_search_artist
 from execution import spotify_get_artist_tracks
 from execution import spotify_create_playlist
 from execution import ui_components
+from execution import image_cache
+from execution import profiling
 from datetime import datetime
 
 # Page configuration
@@ -44,7 +46,7 @@ EAST_AFRICA_ARTISTS = {
     ]
 }
 
-def main():
+def main(profiler):
     # Auth Flow (Preserved)
     if 'token_info' not in st.session_state:
         query_params = st.query_params
@@ -53,6 +55,7 @@ def main():
             try:
                 token_info = spotify_auth.get_token_from_code(code)
                 st.session_state['token_info'] = token_info
+                st.session_state.pop('user_profile', None)
                 st.query_params.clear()
                 st.rerun()
             except Exception as e:
@@ -74,20 +77,33 @@ def main():
 
     # Authenticated
     token_info = st.session_state.get('token_info')
-    sp, token_info = spotify_auth.get_spotify_client(token_info)
+    # Tokens refreshed mid-rerun (e.g. during a long discography load) are written straight back
+    with profiler.phase("get_spotify_client"):
+        sp, token_info = spotify_auth.get_spotify_client(
+            token_info,
+            on_refresh=lambda new_token_info: st.session_state.update(token_info=new_token_info)
+        )
     if token_info:
         st.session_state['token_info'] = token_info
     else:
         st.session_state.pop('token_info', None)
+        st.session_state.pop('user_profile', None)
         st.rerun()
 
     # --- MAIN APP UI ---
     
     # Sidebar: User & Nav
+    market = None
     with st.sidebar:
         try:
-            user = sp.current_user()
-            st.image(user['images'][0]['url'] if user['images'] else "https://via.placeholder.com/150", width=60)
+            # Profile only changes on login, so fetch it once per session
+            if 'user_profile' not in st.session_state:
+                with profiler.phase("current_user"):
+                    st.session_state['user_profile'] = sp.current_user()
+            user = st.session_state['user_profile']
+            # Scope every catalog request to the listener's country
+            market = user.get('country')
+            st.image(image_cache.thumbnail_file(user['images'][0]['url'] if user['images'] else None, 120), width=60)
             st.write(f"Logged in as **{user['display_name']}**")
             # Clear old session data if switching users
             if 'current_user_id' not in st.session_state:
@@ -97,6 +113,7 @@ def main():
                 st.rerun()
                 
             if st.button("Logout", key="logout_btn"):
+                spotify_auth.forget_token(st.session_state.get('token_info'))
                 st.session_state.clear()
                 st.rerun()
         except:
@@ -121,7 +138,8 @@ def main():
             if st.button("GO", key="search_btn", use_container_width=True):
                 if search_query:
                     with st.spinner("Searching..."):
-                        results = spotify_search_artist.search_artist(sp, search_query)
+                        with profiler.phase("search_artist"):
+                            results = spotify_search_artist.search_artist(sp, search_query)
                         if results:
                             st.session_state['current_artist'] = results[0]
                             st.rerun()
@@ -133,6 +151,12 @@ def main():
         st.subheader("East African Hip Hop Hall of Fame")
         st.write("Curated selections from across the region.")
         
+        # First visit downloads all covers at once; afterwards they are served from disk
+        with profiler.phase("prefetch_thumbnails"):
+            image_cache.prefetch_thumbnails(
+                [legend['img'] for artists in EAST_AFRICA_ARTISTS.values() for legend in artists]
+            )
+        
         for category, artists in EAST_AFRICA_ARTISTS.items():
             st.markdown(f"### {category}")
             # Dynamic columns based on count, wrapping every 4
@@ -144,12 +168,14 @@ def main():
                      cols = st.columns(4)
                 
                 with cols[col_idx]:
-                    ui_components.render_legend_card(legend['name'], legend['img'], legend['desc'])
+                    with profiler.phase("render_legend_cards"):
+                        ui_components.render_legend_card(legend['name'], legend['img'], legend['desc'])
                     # Unique key for every button
                     btn_key = f"btn_{legend['name'].replace(' ', '_')}"
                     if st.button(f"Select {legend['name']}", key=btn_key):
                         with st.spinner(f"Loading {legend['name']}..."):
-                            results = spotify_search_artist.search_artist(sp, legend['name'])
+                            with profiler.phase("search_artist"):
+                                results = spotify_search_artist.search_artist(sp, legend['name'])
                             if results:
                                 st.session_state['current_artist'] = results[0]
                                 st.rerun()
@@ -198,44 +224,61 @@ def main():
             era_range = st.slider("Era (Year)", 1990, current_year, default_era)
             
         # --- DATA FETCHING & FILTERING ---
-        if 'tracks_cache' not in st.session_state or st.session_state.get('tracks_artist_id') != artist['id']:
+        # Releases outside the era are never fetched; widening the era only fetches the new years
+        if st.session_state.get('tracks_artist_id') != artist['id']:
+            st.session_state['tracks_cache'] = []
+            st.session_state['tracks_artist_id'] = artist['id']
+            st.session_state['tracks_era'] = None
+        cached_era = st.session_state['tracks_era']
+        missing_eras = spotify_get_artist_tracks.missing_year_ranges(cached_era, era_range)
+        if missing_eras:
             with st.status("Fetching Discography & Analyzing Vibes...", expanded=True) as status:
-                tracks = spotify_get_artist_tracks.get_all_artist_tracks(
-                    sp, 
-                    artist['id'], 
-                    artist['name'],
-                    progress_callback=lambda msg: status.write(msg)
-                )
+                tracks = st.session_state['tracks_cache']
+                for missing_era in missing_eras:
+                    with profiler.phase("get_all_artist_tracks"):
+                        new_tracks = spotify_get_artist_tracks.get_all_artist_tracks(
+                            sp,
+                            artist['id'],
+                            artist['name'],
+                            progress_callback=lambda msg: status.write(msg),
+                            year_range=missing_era,
+                            market=market
+                        )
+                    tracks = spotify_get_artist_tracks.merge_tracks(tracks, new_tracks)
                 st.session_state['tracks_cache'] = tracks
-                st.session_state['tracks_artist_id'] = artist['id']
+                st.session_state['tracks_era'] = (
+                    (min(cached_era[0], era_range[0]), max(cached_era[1], era_range[1]))
+                    if cached_era else tuple(era_range)
+                )
                 status.update(label="Analysis Complete!", state="complete", expanded=False)
         
         all_tracks = st.session_state['tracks_cache']
         
         # APPLY FILTERS
-        filtered_tracks = []
-        for t in all_tracks:
-            # 1. Era Filter
-            track_year = t.get('release_year', 2000)
-            if not (era_range[0] <= track_year <= era_range[1]):
-                continue
+        with profiler.phase("filter_tracks"):
+            filtered_tracks = []
+            for t in all_tracks:
+                # 1. Era Filter
+                track_year = t.get('release_year', 2000)
+                if not (era_range[0] <= track_year <= era_range[1]):
+                    continue
 
-            # 2. Vibe Filter
-            energy = t.get('energy', 0.5)
-            valence = t.get('valence', 0.5)
+                # 2. Vibe Filter
+                energy = t.get('energy', 0.5)
+                valence = t.get('valence', 0.5)
             
-            if not (vibe_energy[0] <= energy <= vibe_energy[1]):
-                continue
-            if not (vibe_valence[0] <= valence <= vibe_valence[1]):
-                continue
+                if not (vibe_energy[0] <= energy <= vibe_energy[1]):
+                    continue
+                if not (vibe_valence[0] <= valence <= vibe_valence[1]):
+                    continue
 
-            # 3. Deep Cuts Filter (Remove popular tracks)
-            # Threshold: > 60 is usually a "hit" or at least very well known
-            popularity = t.get('popularity', 0)
-            if deep_cuts and popularity > 60:
-                continue
+                # 3. Deep Cuts Filter (Remove popular tracks)
+                # Threshold: > 60 is usually a "hit" or at least very well known
+                popularity = t.get('popularity', 0)
+                if deep_cuts and popularity > 60:
+                    continue
                 
-            filtered_tracks.append(t)
+                filtered_tracks.append(t)
             
         st.subheader(f"Playlist Preview ({len(filtered_tracks)} tracks)")
         
@@ -247,12 +290,13 @@ def main():
                 try:
                     playlist_name = f"{artist['name']} - Custom Mix"
                     desc = f"Generated by Spotify Creator Xt. Filters: Energy={vibe_energy}, Mood={vibe_valence}, Era={era_range}"
-                    playlist = spotify_create_playlist.create_playlist_for_user(sp, user['id'], playlist_name, desc)
+                    with profiler.phase("create_playlist"):
+                        playlist = spotify_create_playlist.create_playlist_for_user(sp, user['id'], playlist_name, desc)
                     
-                    uris = [t['uri'] for t in filtered_tracks]
-                    # Batch add (Spotify limit 100)
-                    for i in range(0, len(uris), 100):
-                        spotify_create_playlist.add_tracks_to_playlist(sp, playlist['id'], uris[i:i+100])
+                        uris = [t['uri'] for t in filtered_tracks]
+                        # Batch add (Spotify limit 100)
+                        for i in range(0, len(uris), 100):
+                            spotify_create_playlist.add_tracks_to_playlist(sp, playlist['id'], uris[i:i+100])
                         
                     st.balloons()
                     st.success(f"Playlist '{playlist_name}' Created!")
@@ -267,7 +311,14 @@ def main():
                 "Album": t['album'],
                 "Year": t.get('release_year', '-')
             } for t in filtered_tracks]
-            st.dataframe(display_data, use_container_width=True, hide_index=True)
+            with profiler.phase("st.dataframe"):
+                st.dataframe(display_data, use_container_width=True, hide_index=True)
 
 if __name__ == "__main__":
-    main()
+    # Opt-in per-phase timing (SPOTIFY_PROFILE on the server), a no-op otherwise
+    profiler = profiling.start_rerun()
+    try:
+        main(profiler)
+    finally:
+        profiler.stop()
+    profiler.render()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Image Cache
+
+Downloads artwork once, stores small WebP thumbnails on disk and serves them
+through Streamlit static file serving (see .streamlit/config.toml).
+Thumbnail names (and their ?v= query) come from a hash of the source URL.
+Spotify image URLs are never reused for different artwork, so browsers can cache
+them long-term (Cache-Control) and revalidate by ETag. Failed downloads are
+remembered for a while and shown as the placeholder, so a dead or slow cover
+never stalls a rerun more than once. The cache keeps at most MAX_THUMBNAILS
+files, evicting the least recently used.
+
+Usage:
+    from execution.image_cache import thumbnail_url, thumbnail_file, prefetch_thumbnails
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Thumbnails are an optimization; fall back to remote URLs
+    Image = None
+
+# Streamlit serves <app dir>/static at app/static/
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+THUMB_DIR = os.path.join(STATIC_DIR, "thumbs")
+STATIC_URL = "app/static/thumbs"
+
+THUMB_SIZE = 160
+PLACEHOLDER_COLOR = (40, 40, 40)  # Matches the #282828 input background
+DOWNLOAD_TIMEOUT = 10
+# Only used when thumbnails cannot be generated locally
+REMOTE_PLACEHOLDER = "https://via.placeholder.com/{size}"
+# Seconds before a failed download is tried again
+FAILURE_TTL = 600
+# Thumbnails kept on disk; every searched artist adds one, so the oldest are evicted
+MAX_THUMBNAILS = 200
+
+_failures_guard = threading.Lock()
+_failed_downloads = {}  # url -> time after which it may be retried
+
+
+def _thumb_name(url, size):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return f"{digest}_{size}.webp"
+
+
+def _placeholder_name(size):
+    return f"placeholder_{size}.webp"
+
+
+def _save_webp(image, path):
+    """Write atomically so concurrent reruns never serve a half-written file."""
+    os.makedirs(THUMB_DIR, exist_ok=True)
+    # Sessions and prefetch workers are threads of one process, so each write needs its own file
+    fd, tmp_path = tempfile.mkstemp(dir=THUMB_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            image.save(tmp_file, "WEBP", quality=80, method=6)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def _recently_failed(url):
+    with _failures_guard:
+        retry_after = _failed_downloads.get(url)
+        if retry_after is not None and retry_after < time.time():
+            del _failed_downloads[url]
+            return False
+        return retry_after is not None
+
+
+def _record_failure(url):
+    with _failures_guard:
+        now = time.time()
+        # URLs that are never requested again would otherwise stay here forever
+        for failed_url, retry_after in list(_failed_downloads.items()):
+            if retry_after < now:
+                del _failed_downloads[failed_url]
+        _failed_downloads[url] = now + FAILURE_TTL
+
+
+def _prune_thumbnails():
+    """Delete the least recently used thumbnails beyond MAX_THUMBNAILS (placeholders are kept)."""
+    try:
+        entries = [
+            entry for entry in os.scandir(THUMB_DIR)
+            if entry.name.endswith(".webp") and not entry.name.startswith("placeholder_")
+        ]
+        if len(entries) <= MAX_THUMBNAILS:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - MAX_THUMBNAILS]:
+            os.remove(entry.path)
+    except OSError as e:
+        # Another session may have pruned the same file first
+        print(f"Error pruning thumbnails: {e}")
+
+
+def _ensure_placeholder(size):
+    path = os.path.join(THUMB_DIR, _placeholder_name(size))
+    if not os.path.exists(path):
+        _save_webp(Image.new("RGB", (size, size), PLACEHOLDER_COLOR), path)
+    return path
+
+
+def _ensure_thumbnail(url, size):
+    """
+    Return the local thumbnail path for url, downloading and resizing it on first use.
+    Falls back to the placeholder when there is no url or its download failed recently,
+    or None if caching is unavailable.
+    """
+    if Image is None:
+        return None
+
+    try:
+        if not url or _recently_failed(url):
+            return _ensure_placeholder(size)
+
+        path = os.path.join(THUMB_DIR, _thumb_name(url, size))
+        if not os.path.exists(path):
+            try:
+                with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+                    image = Image.open(io.BytesIO(response.read())).convert("RGB")
+            except Exception as e:
+                print(f"Error downloading image {url}: {e}")
+                _record_failure(url)
+                return _ensure_placeholder(size)
+            # Artwork is shown cropped to a circle, so a centred square is enough
+            _save_webp(ImageOps.fit(image, (size, size), Image.LANCZOS), path)
+            _prune_thumbnails()
+        else:
+            # Mark as recently used so frequently shown artwork is never evicted
+            os.utime(path)
+        return path
+    except Exception as e:
+        print(f"Error caching image {url}: {e}")
+        return None
+
+
+def thumbnail_url(url, size=THUMB_SIZE):
+    """
+    Get a browser URL for a cached thumbnail of url.
+
+    Args:
+        url: Remote image URL (None for the placeholder)
+        size: Square edge length in pixels
+
+    Returns:
+        str: Static URL of the thumbnail, or the original url if it could not be cached
+    """
+    path = _ensure_thumbnail(url, size)
+    if not path:
+        return url or REMOTE_PLACEHOLDER.format(size=size)
+    name = os.path.basename(path)
+    # Any ?v= argument switches Tornado's static handler to long-lived Cache-Control
+    return f"{STATIC_URL}/{name}?v={name.split('_')[0]}"
+
+
+def thumbnail_file(url, size=THUMB_SIZE):
+    """Get a local file path for a cached thumbnail of url (for st.image)."""
+    return _ensure_thumbnail(url, size) or url or REMOTE_PLACEHOLDER.format(size=size)
+
+
+def prefetch_thumbnails(urls, size=THUMB_SIZE):
+    """Download any missing thumbnails in parallel so a page render never waits on them one by one."""
+    missing = [
+        url for url in urls
+        if url and not _recently_failed(url) and not os.path.exists(os.path.join(THUMB_DIR, _thumb_name(url, size)))
+    ]
+    if not missing or Image is None:
+        return
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda url: _ensure_thumbnail(url, size), missing))
+
+
+if __name__ == "__main__":
+    print("This module is designed to be imported by the main app.")
+    print(f"Thumbnails are stored in {THUMB_DIR}")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Rerun Profiling
+
+Opt-in timing of each phase of a Streamlit rerun, enabled on the server only.
+Set SPOTIFY_PROFILE=1 to time every rerun, or "cprofile" / "pyinstrument" to also
+capture a full profile. SPOTIFY_PROFILE=url profiles only visits opened with
+?profile=1 (or ?profile=cprofile / ?profile=pyinstrument); without the
+environment variable the URL parameter is ignored.
+Each completed rerun is shown in a collapsible breakdown, and every rerun
+(including those cut short by st.rerun) is appended to PROFILE_LOG.
+
+Usage:
+    from execution.profiling import start_rerun
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:  # Optional, only needed for SPOTIFY_PROFILE=pyinstrument
+    PyinstrumentProfiler = None
+
+PROFILE_LOG = os.getenv("SPOTIFY_PROFILE_LOG", "profile.log")
+CPROFILE_LINES = 25
+
+
+def get_profile_mode():
+    """
+    Read the profiling mode from the environment (and the URL, if the server allows it).
+    Returns None (off), "timing", "cprofile" or "pyinstrument".
+    """
+    mode = os.getenv("SPOTIFY_PROFILE")
+    if mode and mode.lower() == "url":
+        mode = st.query_params.get("profile")
+    if not mode or mode.lower() in ("0", "false", "off"):
+        return None
+    mode = mode.lower()
+    return mode if mode in ("cprofile", "pyinstrument") else "timing"
+
+
+class RerunProfiler:
+    """
+    Collects per-phase wall-clock timings for a single rerun.
+    When disabled every method is a no-op, so call sites need no checks.
+    """
+
+    def __init__(self, mode=None):
+        self.mode = mode
+        self.phases = {}  # name -> [seconds, calls], in first-seen order
+        self.deep_profile = None
+        self.total = None
+        self._deep_profiler = None
+        self._started = time.perf_counter()
+
+        try:
+            if mode == "cprofile":
+                self._deep_profiler = cProfile.Profile()
+                self._deep_profiler.enable()
+            elif mode == "pyinstrument":
+                if PyinstrumentProfiler is None:
+                    print("pyinstrument is not installed, falling back to phase timings")
+                else:
+                    self._deep_profiler = PyinstrumentProfiler()
+                    self._deep_profiler.start()
+        except (ValueError, RuntimeError) as e:
+            # Python 3.12+ allows one profiler per process, and other sessions may hold it
+            print(f"Could not start {mode} profiler ({e}), falling back to phase timings")
+            self._deep_profiler = None
+
+    @property
+    def enabled(self):
+        return self.mode is not None
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as one named phase (also on st.rerun/st.stop)."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, [0.0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+
+    def _stop_deep_profiler(self):
+        if self._deep_profiler is None:
+            return
+        if self.mode == "cprofile":
+            self._deep_profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(self._deep_profiler, stream=out).sort_stats("cumulative").print_stats(CPROFILE_LINES)
+            self.deep_profile = out.getvalue()
+        else:
+            self._deep_profiler.stop()
+            self.deep_profile = self._deep_profiler.output_text()
+        self._deep_profiler = None
+
+    def _write_log(self, total):
+        lines = [f"=== Rerun {datetime.now().isoformat(timespec='seconds')} total={total * 1000:.1f}ms"]
+        lines += [f"{name:<32} {seconds * 1000:>10.1f}ms  x{calls}" for name, (seconds, calls) in self.phases.items()]
+        if self.deep_profile:
+            lines.append(self.deep_profile)
+        try:
+            with open(PROFILE_LOG, "a", encoding="utf-8") as log_file:
+                log_file.write("\n".join(lines) + "\n\n")
+        except OSError as e:
+            print(f"Error writing profile log: {e}")
+
+    def stop(self):
+        """Stop profiling and append the rerun to the log. Safe to call from a finally block."""
+        if not self.enabled or self.total is not None:
+            return
+        self.total = time.perf_counter() - self._started
+        self._stop_deep_profiler()
+        self._write_log(self.total)
+
+    def render(self):
+        """Show the collapsible per-phase breakdown for this rerun."""
+        if not self.enabled or self.total is None:
+            return
+        total = self.total
+        with st.expander(f"⏱️ Rerun profile ({total * 1000:.0f} ms)", expanded=False):
+            st.dataframe([{
+                "Phase": name,
+                "Calls": calls,
+                "ms": round(seconds * 1000, 1),
+                "%": round(100 * seconds / total, 1) if total else 0
+            } for name, (seconds, calls) in self.phases.items()], use_container_width=True, hide_index=True)
+            if self.deep_profile:
+                st.code(self.deep_profile, language="text")
+
+
+def start_rerun():
+    """Create the profiler for the current rerun (disabled unless profiling mode is on)."""
+    return RerunProfiler(get_profile_mode())
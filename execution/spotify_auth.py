@@ -3,6 +3,8 @@
 Spotify Authentication Helper
 
 Handles OAuth flow for Spotify API.
+Tokens are refreshed ahead of expiry, once per user even across concurrent reruns,
+and requests rejected with a 401 are retried after a forced refresh.
 This script is designed to be imported by the Streamlit app or other scripts.
 
 Usage:
@@ -10,7 +12,11 @@ Usage:
 """
 
 import os
+import threading
+import time
+from contextlib import contextmanager
 import spotipy
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
 
@@ -19,7 +25,18 @@ import streamlit as st
 # Load environment variables
 load_dotenv()
 
-SCOPE = "user-library-read playlist-modify-public playlist-modify-private"
+SCOPE = "user-library-read user-read-private playlist-modify-public playlist-modify-private"
+
+# Refresh this many seconds before expiry so a long discography load never crosses it
+REFRESH_MARGIN = 300
+
+# How long a refresh result is kept for concurrent reruns waiting on the same refresh
+REFRESH_HANDOFF = 60
+
+# Single-flight refresh state shared by every session in this process
+_refresh_guard = threading.Lock()
+_refresh_locks = {}  # refresh_token -> [Lock, number of callers holding or waiting on it]
+_refreshed_tokens = {}  # refresh_token -> (newest token_info, handoff deadline)
 
 
 def get_credentials():
@@ -46,8 +63,9 @@ def get_credentials():
     return client_id, client_secret, redirect_uri
 
 
+@st.cache_resource
 def get_oauth_manager():
-    """Create and return SpotifyOAuth manager."""
+    """Create and return SpotifyOAuth manager (shared across reruns)."""
     CLIENT_ID, CLIENT_SECRET, REDIRECT_URI = get_credentials()
     
     if not CLIENT_ID or not CLIENT_SECRET or not REDIRECT_URI:
@@ -79,25 +97,114 @@ def get_token_from_code(code):
     return auth_manager.get_access_token(code)
 
 
-def get_spotify_client(token_info):
+def _expires_soon(token_info):
+    return token_info['expires_at'] - int(time.time()) < REFRESH_MARGIN
+
+
+def _prune_refresh_state():
+    """Drop handoffs past their deadline and idle locks, so no token outlives its refresh. Caller holds _refresh_guard."""
+    now = time.time()
+    for refresh_token, (_, deadline) in list(_refreshed_tokens.items()):
+        if deadline < now:
+            del _refreshed_tokens[refresh_token]
+    for refresh_token, (_, users) in list(_refresh_locks.items()):
+        # A lock handed to a caller must survive until it is released, or a second one could be created
+        if refresh_token not in _refreshed_tokens and users == 0:
+            del _refresh_locks[refresh_token]
+
+
+@contextmanager
+def _refresh_lock(refresh_token):
+    """Hold the per-user refresh lock; it is counted as in use from hand-off until release."""
+    with _refresh_guard:
+        _prune_refresh_state()
+        entry = _refresh_locks.setdefault(refresh_token, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _refresh_guard:
+            entry[1] -= 1
+
+
+def forget_token(token_info):
+    """Remove any shared refresh state for a user's token (call on logout)."""
+    if not token_info:
+        return
+    with _refresh_guard:
+        _refreshed_tokens.pop(token_info.get('refresh_token'), None)
+        _prune_refresh_state()
+
+
+class TokenManager:
+    """
+    Spotipy auth manager that keeps a user's token fresh for the lifetime of a client.
+    
+    Spotipy asks it for a token before every request, so a token expiring
+    midway through a long fetch is refreshed in place rather than failing.
+    """
+
+    def __init__(self, token_info, on_refresh=None):
+        self.token_info = token_info
+        self.on_refresh = on_refresh
+
+    def get_access_token(self, as_dict=False):
+        if _expires_soon(self.token_info):
+            self.refresh()
+        return self.token_info if as_dict else self.token_info['access_token']
+
+    def refresh(self):
+        """
+        Refresh the token, sharing the result with any session holding the same refresh token.
+        Only one refresh per user runs at a time; others wait and reuse its result.
+        """
+        refresh_token = self.token_info['refresh_token']
+        
+        with _refresh_lock(refresh_token):
+            with _refresh_guard:
+                newest, _ = _refreshed_tokens.get(refresh_token, (None, None))
+            # Another rerun may have refreshed while we waited on the lock
+            if not newest or newest['access_token'] == self.token_info['access_token'] or _expires_soon(newest):
+                newest = get_oauth_manager().refresh_access_token(refresh_token)
+                with _refresh_guard:
+                    _refreshed_tokens[refresh_token] = (newest, time.time() + REFRESH_HANDOFF)
+                
+        self.token_info = newest
+        if self.on_refresh:
+            self.on_refresh(newest)
+        return newest
+
+
+class RefreshingSpotify(spotipy.Spotify):
+    """Spotipy client that re-authenticates and retries once when a request gets a 401."""
+
+    def _internal_call(self, method, url, payload, params):
+        try:
+            # Spotipy consumes keys from params, keep the original for the retry
+            return super()._internal_call(method, url, payload, dict(params))
+        except SpotifyException as e:
+            if e.http_status != 401 or not isinstance(self.auth_manager, TokenManager):
+                raise
+            self.auth_manager.refresh()
+            return super()._internal_call(method, url, payload, params)
+
+
+def get_spotify_client(token_info, on_refresh=None):
     """
     Returns a Spotipy client instance using the provided token info.
-    Checks if token is expired and refreshes if necessary.
+    Refreshes the token if it is close to expiry, and keeps refreshing it
+    for as long as the client is used. on_refresh is called with each new token info.
     """
     if not token_info:
         return None
         
-    auth_manager = get_oauth_manager()
+    token_manager = TokenManager(token_info, on_refresh)
     
-    # Check if token is expired
-    if auth_manager.is_token_expired(token_info):
-        try:
-            token_info = auth_manager.refresh_access_token(token_info['refresh_token'])
-        except Exception as e:
-            print(f"Error refreshing token: {e}")
-            return None, None
+    try:
+        token_manager.get_access_token()
+    except Exception as e:
+        print(f"Error refreshing token: {e}")
+        return None, None
             
-    return spotipy.Spotify(auth=token_info['access_token']), token_info
-
-
-
+    return RefreshingSpotify(auth_manager=token_manager), token_manager.token_info
@@ -3,9 +3,11 @@
 Spotify Get Artist Tracks
 
 Fetches all tracks for a given artist (albums and singles).
-Filters to ensure artist is a primary performer.
+Filters to ensure artist is a primary performer and collapses duplicate
+versions of a song (remasters, live cuts, re-releases) to the original.
 """
 
+import re
 import sys
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
@@ -15,7 +17,233 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-def get_all_artist_tracks(sp, artist_id, artist_name, progress_callback=None):
+# Release types in order of preference when the same song appears more than once
+ALBUM_TYPE_RANK = {'album': 0, 'single': 1, 'compilation': 2}
+
+# Bracketed or dashed suffixes that mark another version of the same song,
+# e.g. "Song (Remastered 2011)", "Song - Live", "Song - 2011 Remaster", "Song [Radio Edit]".
+# A dashed suffix may only hold version words, so "Song - I Live Here" and "Song - Clean Slate" are left alone.
+_VERSION_WORDS = r"remaster(?:ed)?|live|version|edit|mono|stereo|explicit|clean|bonus|acoustic|deluxe|edition|expanded"
+# Words that may surround a version word in a dashed suffix ("2011 Remaster", "Radio Edit")
+_VERSION_FILLER = r"\d{4}|radio|single|album|digital|original|mix"
+_DASHED_SUFFIX = (
+    rf"\s-\s(?:(?:{_VERSION_FILLER})\s)*(?:{_VERSION_WORDS})"
+    rf"(?:\s(?:{_VERSION_FILLER}|{_VERSION_WORDS}))*(?:\s(?:at|from|in)\s[^-]*)?"
+)
+_VERSION_SUFFIX_RE = re.compile(
+    rf"\s*(?:[\(\[][^\)\]]*\b(?:{_VERSION_WORDS})\b[^\)\]]*[\)\]]|{_DASHED_SUFFIX})$",
+    re.IGNORECASE
+)
+# Suffix words that mark a different recording rather than a repackaging ("Deluxe", "Remastered")
+_RECORDING_RE = re.compile(r"\b(?:live|acoustic|instrumental|mono|stereo|mix|edit)\b", re.IGNORECASE)
+# Featured artist credits differ between single and album releases.
+# "(with ...)" is left alone: it is as often part of a title ("Dance (With Me)") as a credit,
+# and a "(with Artist)" credit is still collapsed by the ISRC pass.
+_FEATURE_RE = re.compile(r"\s*[\(\[](?:feat\.?|ft\.?|featuring)\s[^\)\]]*[\)\]]", re.IGNORECASE)
+
+
+def _split_title(name):
+    """Split a title into its base and the version suffixes stripped from it (outermost first)."""
+    title = _FEATURE_RE.sub('', name)
+    suffixes = []
+    
+    match = _VERSION_SUFFIX_RE.search(title)
+    # A title that is nothing but a tag, e.g. "(Live)", is kept as is
+    while match and match.start() > 0:
+        suffixes.append(match.group().strip())
+        title = title[:match.start()]
+        match = _VERSION_SUFFIX_RE.search(title)
+        
+    return title, suffixes
+
+
+def normalize_title(name):
+    """
+    Reduce a track title to a key shared by all versions of the same song.
+    
+    Returns:
+        tuple: (title_key, is_alternate_version)
+    """
+    title, suffixes = _split_title(name)
+    return ' '.join(title.casefold().split()), bool(suffixes)
+
+
+def _edition_key(album):
+    """
+    Group key for editions of one release: "Debut" and "Debut (Deluxe Edition)" match,
+    but "Debut (Live)" is a different recording and stays separate.
+    """
+    title, suffixes = _split_title(album['name'])
+    recordings = tuple(' '.join(suffix.casefold().split()) for suffix in suffixes if _RECORDING_RE.search(suffix))
+    return album.get('album_type'), ' '.join(title.casefold().split()), recordings
+
+
+def _title_key(track):
+    return normalize_title(track['name'])[0]
+
+
+def _isrc_key(track):
+    # Tracks without an ISRC only ever group with themselves
+    return track.get('isrc') or track['id']
+
+
+def _preference(track):
+    """Sort key: original versions, then album > single > compilation, then earliest release."""
+    return (
+        normalize_title(track['name'])[1],
+        ALBUM_TYPE_RANK.get(track.get('album_type'), len(ALBUM_TYPE_RANK)),
+        track.get('release_date') or '9999'
+    )
+
+
+def dedupe_tracks(tracks, key_func=_title_key):
+    """
+    Collapse duplicate tracks, keeping the preferred version of each.
+    
+    Args:
+        tracks: List of track dictionaries
+        key_func: Function mapping a track to its grouping key
+        
+    Returns:
+        list: One track per group, in order of first appearance
+    """
+    groups = {}
+    for track in tracks:
+        groups.setdefault(key_func(track), []).append(track)
+        
+    return [min(group, key=_preference) for group in groups.values()]
+
+
+def merge_tracks(tracks, new_tracks):
+    """Merge two fetched track lists, collapsing duplicates across them by title and ISRC."""
+    return dedupe_tracks(dedupe_tracks(tracks + new_tracks), key_func=_isrc_key)
+
+
+def missing_year_ranges(covered, requested):
+    """
+    Work out which years of a requested range have not been fetched yet.
+    
+    Args:
+        covered: (start_year, end_year) already fetched, or None
+        requested: (start_year, end_year) now needed
+        
+    Returns:
+        list: (start_year, end_year) ranges to fetch; empty if covered
+    """
+    if not covered:
+        return [tuple(requested)]
+        
+    missing = []
+    if requested[0] < covered[0]:
+        missing.append((requested[0], covered[0] - 1))
+    if requested[1] > covered[1]:
+        missing.append((covered[1] + 1, requested[1]))
+    return missing
+
+
+def _release_year(album):
+    """Extract the release year from an album, defaulting to 2000."""
+    release_year = album['release_date'][:4] if album.get('release_date') else "2000"
+    return int(release_year) if release_year.isdigit() else 2000
+
+
+def plan_releases(albums, year_range=None):
+    """
+    Prune an artist's releases using album metadata alone, before any track is fetched.
+    
+    Drops compilations and guest appearances, empty or unavailable releases,
+    extra editions of the same release (keeping the one with the most tracks,
+    dated by the original), and releases outside the selected years.
+    
+    Args:
+        albums: List of simplified album dictionaries from artist_albums
+        year_range: Optional (start_year, end_year) tuple, inclusive
+        
+    Returns:
+        list: Releases to fetch, albums before singles
+    """
+    editions = {}
+    for album in albums:
+        # A compilation can still be listed under album_group 'album', so check both
+        if album.get('album_group', album.get('album_type')) not in ('album', 'single'):
+            continue
+        if album.get('album_type') not in ('album', 'single'):
+            continue
+        if album.get('total_tracks') == 0:
+            continue
+        # Only present when no market is given; empty means not playable anywhere
+        if album.get('available_markets') == []:
+            continue
+            
+        editions.setdefault(_edition_key(album), []).append(album)
+        
+    releases = []
+    for group in editions.values():
+        # Fetch the fullest edition but date it by the original release
+        fullest = max(group, key=lambda album: album.get('total_tracks', 0))
+        dates = [album['release_date'] for album in group if album.get('release_date')]
+        # Keep a missing date missing so _release_year still falls back to 2000
+        release = dict(fullest, release_date=min(dates) if dates else fullest.get('release_date'))
+        # Filter on the merged date, so a reissue never drags older songs into a later era
+        if year_range and not (year_range[0] <= _release_year(release) <= year_range[1]):
+            continue
+        releases.append(release)
+            
+    return sorted(
+        releases,
+        key=lambda album: ALBUM_TYPE_RANK.get(album.get('album_type'), len(ALBUM_TYPE_RANK))
+    )
+
+
+def _fetch_release_tracks(sp, releases, market=None):
+    """
+    Fetch the tracks of planned releases, requesting albums in batches of 20 (Spotify API limit).
+    
+    Yields:
+        tuple: (planned release, list of simplified track dictionaries)
+    """
+    for i in range(0, len(releases), 20):
+        batch = releases[i:i + 20]
+        full_albums = sp.albums([album['id'] for album in batch], market=market)['albums']
+        for album, full_album in zip(batch, full_albums):
+            if not full_album:
+                continue
+            tracks_results = full_album['tracks']
+            tracks = list(tracks_results['items'])
+            
+            while tracks_results['next']:
+                tracks_results = sp.next(tracks_results)
+                tracks.extend(tracks_results['items'])
+                
+            yield album, tracks
+
+
+def _artist_tracks(album, tracks, artist_id):
+    """Convert an album's tracks to track dictionaries, keeping those the artist performs on."""
+    candidates = []
+    for track in tracks:
+        # Only set when a market is given; relinking already swapped in a playable copy if one exists
+        if track.get('is_playable') is False:
+            continue
+            
+        # Check if artist is a primary artist on this track
+        artists_on_track = [a['id'] for a in track['artists']]
+        
+        if artist_id in artists_on_track:
+            candidates.append({
+                'name': track['name'],
+                'uri': track['uri'],
+                'id': track['id'],
+                'album': album['name'],
+                'album_type': album.get('album_type'),
+                'release_date': album.get('release_date') or '',
+                'release_year': _release_year(album),
+                'duration_ms': track['duration_ms']
+            })
+    return candidates
+
+
+def get_all_artist_tracks(sp, artist_id, artist_name, progress_callback=None, year_range=None, market=None):
     """
     Fetch all unique tracks for an artist.
     
@@ -24,6 +252,8 @@ def get_all_artist_tracks(sp, artist_id, artist_name, progress_callback=None):
         artist_id: Spotify Artist ID
         artist_name: Name of the artist (for filtering)
         progress_callback: Optional function to report progress (msg)
+        year_range: Optional (start_year, end_year) tuple; releases outside it are never fetched
+        market: Optional ISO 3166-1 country code; scopes every request to releases playable there
         
     Returns:
         list: List of track dictionaries
@@ -31,60 +261,51 @@ def get_all_artist_tracks(sp, artist_id, artist_name, progress_callback=None):
     if progress_callback:
         progress_callback("Fetching albums...")
         
-    # 1. Get all albums (include singles and compilations)
+    # 1. Get all albums and singles (compilations and appears_on are never used)
     albums = []
-    results = sp.artist_albums(artist_id, album_type='album,single', limit=50)
+    results = sp.artist_albums(artist_id, album_type='album,single', country=market, limit=50)
     albums.extend(results['items'])
     
     while results['next']:
         results = sp.next(results)
         albums.extend(results['items'])
         
+    releases = plan_releases(albums, year_range)
+        
     if progress_callback:
-        progress_callback(f"Found {len(albums)} releases. Fetching tracks...")
+        progress_callback(f"Found {len(albums)} releases, {len(releases)} to scan. Fetching tracks...")
         
-    # 2. Get tracks for each album
-    all_tracks = []
-    seen_track_names = set() # Simple name-based deduplication
+    # 2. Get tracks for albums first, then only the singles that add new songs
+    candidates = []
+    album_titles = set()
     
-    for album in albums:
-        # Get tracks for this album
-        tracks_results = sp.album_tracks(album['id'])
-        tracks = tracks_results['items']
+    full_albums = [r for r in releases if r.get('album_type') != 'single']
+    singles = [r for r in releases if r.get('album_type') == 'single']
+    
+    for album, tracks in _fetch_release_tracks(sp, full_albums, market):
+        candidates.extend(_artist_tracks(album, tracks, artist_id))
         
-        while tracks_results['next']:
-            tracks_results = sp.next(tracks_results)
-            tracks.extend(tracks_results['items'])
+    for candidate in candidates:
+        title_key, is_alternate = normalize_title(candidate['name'])
+        if not is_alternate:
+            album_titles.add(title_key)
             
-        for track in tracks:
-            # Check if artist is a primary artist on this track
-            artists_on_track = [a['id'] for a in track['artists']]
-            
-            if artist_id in artists_on_track:
-                # Deduplicate based on name (ignoring case)
-                track_name_key = track['name'].lower().strip()
-                
-                # Check for "remix", "live", "acoustic" if you want strict studio versions
-                # For now, we'll just basic deduplicate
+    # A single whose title is already an album track would lose dedup anyway
+    singles = [
+        single for single in singles
+        if single.get('total_tracks', 1) > 1 or normalize_title(single['name'])[0] not in album_titles
+    ]
+    
+    for album, tracks in _fetch_release_tracks(sp, singles, market):
+        candidates.extend(_artist_tracks(album, tracks, artist_id))
                 
-                if track_name_key not in seen_track_names:
-                    seen_track_names.add(track_name_key)
-                    # Extract Year
-                    release_year = album['release_date'][:4] if album.get('release_date') else "2000"
-                    
-                    all_tracks.append({
-                        'name': track['name'],
-                        'uri': track['uri'],
-                        'id': track['id'],
-                        'album': album['name'],
-                        'release_year': int(release_year) if release_year.isdigit() else 2000,
-                        'duration_ms': track['duration_ms']
-                    })
+    # 3. Deduplicate by title before any enrichment call
+    all_tracks = dedupe_tracks(candidates)
                     
     if progress_callback:
         progress_callback(f"Found {len(all_tracks)} unique tracks.")
         
-    # 3. Fetch Popularity (Needed for Deep Cuts) - Batch size 50
+    # 4. Fetch Popularity + ISRC (Needed for Deep Cuts) - Batch size 50
     if all_tracks:
         if progress_callback:
             progress_callback("Fetching popularity scores...")
@@ -95,16 +316,21 @@ def get_all_artist_tracks(sp, artist_id, artist_name, progress_callback=None):
         for i in range(0, len(track_ids), 50):
             batch = track_ids[i:i + 50]
             try:
-                tracks_full = sp.tracks(batch)['tracks']
+                tracks_full = sp.tracks(batch, market=market)['tracks']
                 for j, full_track in enumerate(tracks_full):
                     if full_track:
                         all_tracks[i+j]['popularity'] = full_track['popularity']
+                        all_tracks[i+j]['isrc'] = full_track.get('external_ids', {}).get('isrc')
                     else:
                         all_tracks[i+j]['popularity'] = 0
             except Exception as e:
                 print(f"Error fetching popularity for batch {i}: {e}")
+                
+        # Same recording released under different titles shares an ISRC
+        all_tracks = dedupe_tracks(all_tracks, key_func=_isrc_key)
+        track_ids = [t['id'] for t in all_tracks]
 
-    # 4. Fetch Audio Features (Optional but recommended for "Vibe" filtering)
+    # 5. Fetch Audio Features (Optional but recommended for "Vibe" filtering)
     # limit is 100 tracks per call
     if all_tracks:
         if progress_callback:
@@ -146,13 +372,14 @@ if __name__ == "__main__":
         
         if len(sys.argv) > 1:
             artist_id = sys.argv[1]
+            market = sys.argv[2] if len(sys.argv) > 2 else None
             # Ideally we'd pass name too, but for CLI test we'll skip strict name check
-            tracks = get_all_artist_tracks(sp, artist_id, "Unknown")
+            tracks = get_all_artist_tracks(sp, artist_id, "Unknown", market=market)
             print(f"Found {len(tracks)} tracks.")
             for t in tracks[:5]:
                 print(f"- {t['name']} ({t['album']})")
         else:
-            print("Usage: python spotify_get_artist_tracks.py <artist_id>")
+            print("Usage: python spotify_get_artist_tracks.py <artist_id> [market]")
             
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from execution.image_cache import thumbnail_url
+
 def get_custom_css():
     """
     Returns the global CSS for the 'Neon Noir' theme.
@@ -78,7 +80,8 @@ def render_artist_header(artist):
     if not artist:
         return ""
     
-    image_url = artist['image'] if artist['image'] else "https://via.placeholder.com/300"
+    # 2x the 200px display size for sharp artwork on high-density screens
+    image_url = thumbnail_url(artist['image'], 400)
     
     return st.markdown(f"""
         <div style="
@@ -115,7 +118,7 @@ def render_legend_card(name, image_url, description):
     """
     st.markdown(f"""
         <div class="glass-card" style="text-align: center;">
-            <img src="{image_url}" style="
+            <img src="{thumbnail_url(image_url)}" loading="lazy" style="
                 width: 120px; 
                 height: 120px; 
                 border-radius: 50%; 
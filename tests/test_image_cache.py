@@ -0,0 +1,79 @@
+import io
+import os
+import time
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from execution import image_cache
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def read(self):
+        return self.data
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (200, 10, 10)).save(buffer, "JPEG")
+    downloads = []
+
+    def urlopen(url, timeout):
+        downloads.append(url)
+        if "dead" in url:
+            raise OSError("timed out")
+        return FakeResponse(buffer.getvalue())
+
+    monkeypatch.setattr(image_cache, "THUMB_DIR", str(tmp_path))
+    monkeypatch.setattr(image_cache, "_failed_downloads", {})
+    monkeypatch.setattr(image_cache.urllib.request, "urlopen", urlopen)
+    return downloads
+
+
+def test_thumbnail_is_downloaded_once_and_resized(cache):
+    first = image_cache.thumbnail_file("https://i.scdn.co/image/a")
+    second = image_cache.thumbnail_file("https://i.scdn.co/image/a")
+
+    assert first == second
+    assert cache == ["https://i.scdn.co/image/a"]
+    assert Image.open(first).size == (image_cache.THUMB_SIZE, image_cache.THUMB_SIZE)
+
+
+def test_failed_download_falls_back_to_placeholder_without_retrying(cache):
+    image_cache.prefetch_thumbnails(["https://i.scdn.co/image/dead"])
+    url = image_cache.thumbnail_url("https://i.scdn.co/image/dead")
+
+    assert url.startswith(f"{image_cache.STATIC_URL}/placeholder_")
+    assert cache == ["https://i.scdn.co/image/dead"]
+
+
+def test_expired_failures_are_pruned_when_recording(cache):
+    image_cache._failed_downloads["https://i.scdn.co/image/old"] = time.time() - 1
+    image_cache._record_failure("https://i.scdn.co/image/new")
+
+    assert set(image_cache._failed_downloads) == {"https://i.scdn.co/image/new"}
+
+
+def test_least_recently_used_thumbnails_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(image_cache, "MAX_THUMBNAILS", 2)
+    paths = []
+    for index, name in enumerate("abc"):
+        paths.append(image_cache.thumbnail_file(f"https://i.scdn.co/image/{name}"))
+        os.utime(paths[-1], (index, index))
+        if name == "b":
+            # Showing "a" again makes "b" the least recently used
+            os.utime(image_cache.thumbnail_file("https://i.scdn.co/image/a"), (10, 10))
+
+    remaining = {entry for entry in os.listdir(image_cache.THUMB_DIR) if not entry.startswith("placeholder_")}
+    assert remaining == {os.path.basename(paths[0]), os.path.basename(paths[2])}
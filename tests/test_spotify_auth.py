@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+from spotipy import Spotify
+from spotipy.exceptions import SpotifyException
+
+from execution import spotify_auth
+
+
+class FakeOAuth:
+    """Stands in for SpotifyOAuth, counting refreshes."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def refresh_access_token(self, refresh_token):
+        self.calls.append(refresh_token)
+        time.sleep(self.delay)
+        return {
+            'access_token': f"access-{len(self.calls)}",
+            'refresh_token': refresh_token,
+            'expires_at': int(time.time()) + 3600
+        }
+
+
+@pytest.fixture
+def oauth(monkeypatch):
+    fake = FakeOAuth(delay=0.1)
+    monkeypatch.setattr(spotify_auth, 'get_oauth_manager', lambda: fake)
+    monkeypatch.setattr(spotify_auth, '_refresh_locks', {})
+    monkeypatch.setattr(spotify_auth, '_refreshed_tokens', {})
+    return fake
+
+
+def _token(access_token='stale', refresh_token='refresh', expires_in=10):
+    return {'access_token': access_token, 'refresh_token': refresh_token, 'expires_at': int(time.time()) + expires_in}
+
+
+def test_concurrent_refreshes_call_spotify_once(oauth):
+    managers = [spotify_auth.TokenManager(_token()) for _ in range(2)]
+    threads = [threading.Thread(target=manager.refresh) for manager in managers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert oauth.calls == ['refresh']
+    assert [m.token_info['access_token'] for m in managers] == ['access-1', 'access-1']
+
+
+def test_token_is_refreshed_ahead_of_expiry(oauth):
+    refreshed = []
+    manager = spotify_auth.TokenManager(_token(expires_in=60), on_refresh=refreshed.append)
+
+    assert manager.get_access_token() == 'access-1'
+    assert refreshed == [manager.token_info]
+
+
+def test_fresh_token_is_not_refreshed(oauth):
+    manager = spotify_auth.TokenManager(_token(access_token='fresh', expires_in=3600))
+
+    assert manager.get_access_token() == 'fresh'
+    assert oauth.calls == []
+
+
+def test_lock_in_use_survives_pruning(oauth):
+    with spotify_auth._refresh_lock('refresh'):
+        with spotify_auth._refresh_guard:
+            spotify_auth._prune_refresh_state()
+        assert 'refresh' in spotify_auth._refresh_locks
+
+    with spotify_auth._refresh_guard:
+        spotify_auth._prune_refresh_state()
+    assert spotify_auth._refresh_locks == {}
+
+
+def test_handoff_expires_and_logout_forgets_token(oauth, monkeypatch):
+    spotify_auth.TokenManager(_token(refresh_token='a')).refresh()
+    spotify_auth.TokenManager(_token(refresh_token='b')).refresh()
+
+    spotify_auth.forget_token({'refresh_token': 'a'})
+    assert set(spotify_auth._refreshed_tokens) == {'b'}
+
+    monkeypatch.setattr(spotify_auth, 'REFRESH_HANDOFF', -1)
+    spotify_auth.TokenManager(_token(refresh_token='c')).refresh()
+    spotify_auth.forget_token(None)
+    with spotify_auth._refresh_guard:
+        spotify_auth._prune_refresh_state()
+    assert set(spotify_auth._refreshed_tokens) == {'b'}
+    assert set(spotify_auth._refresh_locks) == {'b'}
+
+
+def test_unauthorized_request_is_retried_after_refresh(oauth, monkeypatch):
+    seen = []
+
+    def internal_call(self, method, url, payload, params):
+        token = self.auth_manager.get_access_token()
+        seen.append(token)
+        if token == 'revoked':
+            raise SpotifyException(401, -1, "The access token expired")
+        return {'token': token}
+
+    monkeypatch.setattr(Spotify, '_internal_call', internal_call)
+    sp = spotify_auth.RefreshingSpotify(
+        auth_manager=spotify_auth.TokenManager(_token(access_token='revoked', expires_in=3600))
+    )
+
+    assert sp._internal_call('GET', 'me', None, {}) == {'token': 'access-1'}
+    assert seen == ['revoked', 'access-1']
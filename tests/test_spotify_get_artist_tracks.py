@@ -0,0 +1,133 @@
+import pytest
+
+from execution.spotify_get_artist_tracks import (
+    _release_year, dedupe_tracks, merge_tracks, missing_year_ranges, normalize_title, plan_releases
+)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Song", ("song", False)),
+    ("Song (Remastered 2011)", ("song", True)),
+    ("Song [Radio Edit]", ("song", True)),
+    ("Song - Live", ("song", True)),
+    ("Song - Live at Wembley", ("song", True)),
+    ("Song - 2011 Remaster", ("song", True)),
+    ("Song - Remastered 2009", ("song", True)),
+    ("Song - Single Version", ("song", True)),
+    ("Song - Live at Wembley - Remastered", ("song", True)),
+    ("Song (feat. Someone)", ("song", False)),
+    ("  SONG  ", ("song", False)),
+])
+def test_normalize_title_strips_version_suffixes(name, expected):
+    assert normalize_title(name) == expected
+
+
+@pytest.mark.parametrize("name", [
+    "Song - I Live Here",
+    "Song - Clean Slate",
+    "Nairobi - Part 2",
+    "Live Wire",
+    "Dance (With Me)",
+    "Stand By Me (With You)",
+])
+def test_normalize_title_keeps_distinct_songs(name):
+    assert normalize_title(name) == (name.casefold(), False)
+
+
+def test_normalize_title_keeps_title_made_only_of_a_tag():
+    assert normalize_title("(Live)") == ("(live)", False)
+
+
+def _track(track_id, name, album_type='album', release_date='2000-01-01'):
+    return {'id': track_id, 'name': name, 'album_type': album_type, 'release_date': release_date}
+
+
+def test_dedupe_prefers_original_then_album_then_earliest():
+    tracks = [
+        _track('c', 'Song', album_type='compilation', release_date='1990'),
+        _track('r', 'Song (Remastered)', release_date='1980'),
+        _track('s', 'Song', album_type='single', release_date='1995'),
+        _track('a2', 'Song', release_date='2005'),
+        _track('a1', 'Song', release_date='1999'),
+    ]
+    assert [t['id'] for t in dedupe_tracks(tracks)] == ['a1']
+
+
+def test_dedupe_keeps_different_songs_apart():
+    tracks = [_track('a', 'Song'), _track('b', 'Song - I Live Here')]
+    assert [t['id'] for t in dedupe_tracks(tracks)] == ['a', 'b']
+
+
+def _album(album_id, name, album_type='album', release_date='2000', total_tracks=10, **extra):
+    return dict({
+        'id': album_id, 'name': name, 'album_type': album_type, 'album_group': album_type,
+        'release_date': release_date, 'total_tracks': total_tracks
+    }, **extra)
+
+
+def test_plan_releases_keeps_missing_release_date():
+    releases = plan_releases([_album('a', 'Debut', release_date='')])
+    assert releases[0]['release_date'] == ''
+    assert _release_year(releases[0]) == 2000
+
+
+def test_plan_releases_dates_fullest_edition_by_original():
+    releases = plan_releases([
+        _album('a', 'Debut', release_date='1999', total_tracks=10),
+        _album('d', 'Debut (Deluxe Edition)', release_date='2005', total_tracks=14),
+        _album('x', 'Debut (Expanded)', release_date='', total_tracks=12),
+    ])
+    assert [(r['id'], r['release_date']) for r in releases] == [('d', '1999')]
+
+
+def test_plan_releases_keeps_studio_album_next_to_larger_live_album():
+    releases = plan_releases([
+        _album('studio', 'Nairobi', total_tracks=10),
+        _album('live', 'Nairobi (Live)', total_tracks=16),
+        _album('acoustic', 'Nairobi - Acoustic Version', total_tracks=8),
+    ])
+    assert sorted(r['id'] for r in releases) == ['acoustic', 'live', 'studio']
+
+
+def test_plan_releases_filters_era_on_original_date():
+    releases = plan_releases([
+        _album('a', 'Debut', release_date='1999'),
+        _album('d', 'Debut (Deluxe)', release_date='2005', total_tracks=14),
+    ], year_range=(2000, 2010))
+    assert releases == []
+
+
+def test_plan_releases_drops_compilations_and_appearances():
+    releases = plan_releases([
+        _album('a', 'Debut'),
+        _album('c', 'Best Of', album_type='compilation', album_group='album'),
+        _album('g', 'Guest Spot', album_group='appears_on'),
+        _album('e', 'Empty', total_tracks=0),
+        _album('u', 'Unplayable', available_markets=[]),
+    ])
+    assert [r['id'] for r in releases] == ['a']
+
+
+def test_plan_releases_filters_by_year_and_orders_albums_first():
+    releases = plan_releases([
+        _album('s', 'Hit', album_type='single', release_date='2001'),
+        _album('old', 'Early Days', release_date='1985'),
+        _album('a', 'Debut', release_date='1999-05-01'),
+    ], year_range=(1990, 2010))
+    assert [r['id'] for r in releases] == ['a', 's']
+
+
+@pytest.mark.parametrize("covered, requested, expected", [
+    (None, (1995, 2010), [(1995, 2010)]),
+    ((1995, 2010), (1998, 2005), []),
+    ((1995, 2010), (1990, 2010), [(1990, 1994)]),
+    ((1995, 2010), (1990, 2026), [(1990, 1994), (2011, 2026)]),
+])
+def test_missing_year_ranges(covered, requested, expected):
+    assert missing_year_ranges(covered, requested) == expected
+
+
+def test_merge_tracks_collapses_duplicates_across_fetches():
+    old = [_track('a', 'Song', release_date='1999')]
+    new = [_track('s', 'Song', album_type='single', release_date='2012'), _track('n', 'New Song')]
+    assert [t['id'] for t in merge_tracks(old, new)] == ['a', 'n']